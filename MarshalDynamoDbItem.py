@@ -1,4 +1,228 @@
-from typing import List, Optional
+import json
+from operator import itemgetter
+from typing import Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+# Repeated integers (status codes, counts, enum-like fields) are common in items,
+# so cache their string form up to a fixed number of distinct values.
+_INT_STR_CACHE_SIZE = 4096
+_INT_STR_CACHE = {}
+
+# DynamoDB type tag of each primitive python type, keyed on the exact type so bool
+# never falls through to int. Built once from MarshalItem.DDB_PRIMITIVES_MAP, see
+# register_type. Dictionaries and lists are walked by _marshal instead.
+_LEAF_TAGS = {}
+# Primitive type each subclass found so far marshals as, e.g. an IntEnum as int
+_PRIMITIVE_BASES = {}
+
+
+def _build_leaf_tags():
+    """Rebuilds _LEAF_TAGS from MarshalItem.DDB_PRIMITIVES_MAP"""
+    _LEAF_TAGS.clear()
+    _PRIMITIVE_BASES.clear()
+    for python_type, tag in MarshalItem.DDB_PRIMITIVES_MAP.items():
+        if tag not in ('M', 'L'):
+            _LEAF_TAGS[python_type] = tag
+
+
+def _marshal_subclass(value) -> Optional[dict]:
+    """Marshal an instance of a subclass of a primitive type, e.g. a str Enum member
+
+    Returns None if value isn't an instance of any primitive type in
+    MarshalItem.DDB_PRIMITIVES_MAP.
+    """
+    value_type = type(value)
+    primitive_type = _PRIMITIVE_BASES.get(value_type)
+    if primitive_type is None:
+        # bool can't be subclassed, so an int subclass can't be mistaken for a bool
+        for python_type, tag in MarshalItem.DDB_PRIMITIVES_MAP.items():
+            if tag not in ('M', 'L') and issubclass(value_type, python_type):
+                primitive_type = _PRIMITIVE_BASES[value_type] = python_type
+                break
+        else:
+            return None
+
+    # Convert through the primitive type, since subclasses such as enums override
+    # __str__: str() of a str Enum member is 'Status.OK' rather than 'ok'
+    if primitive_type is str:
+        value = str.__str__(value)
+    else:
+        value = primitive_type(value)
+
+    tag = MarshalItem.DDB_PRIMITIVES_MAP[primitive_type]
+    return {tag: str(value) if tag == 'N' else value}
+
+
+def register_type(python_type: type, tag: str):
+    """Marshal values of python_type as the DynamoDB attribute type tag
+
+    Use this rather than editing MarshalItem.DDB_PRIMITIVES_MAP directly, so the
+    lookup table used while marshalling is updated once instead of per item.
+
+    Parameters
+    ----------
+    python_type: type
+      The python type to marshal, e.g. decimal.Decimal.
+    tag: str
+      The DynamoDB primitive attribute type, e.g. 'N'.
+
+    >>> register_type(bytes, 'B')
+    >>> marshal({'b': b'x'})
+    {'b': {'B': b'x'}}
+    """
+    if tag in ('M', 'L'):
+        raise ValueError(f'Expected a primitive DynamoDB attribute type, received {tag}')
+    MarshalItem.DDB_PRIMITIVES_MAP[python_type] = tag
+    _build_leaf_tags()
+
+
+def _validate(ddb_item: dict, max_nesting_level: int):
+    """Raises a ValueError if the item or nesting level can't be marshalled"""
+    if not isinstance(ddb_item, dict):
+        raise ValueError(f'Expected `class <dict>`, received {type(ddb_item)}')
+    # bool is an int subclass, so compare the exact type
+    if type(max_nesting_level) is not int or not 1 <= max_nesting_level <= 10:
+        raise ValueError(
+            f'Expected an integer between 1 and 10 inclusive for max_nesting_level, received {max_nesting_level}'
+        )
+
+
+def _marshal(ddb_item: dict, max_nesting_level: int) -> Tuple[dict, dict]:
+    """Convert dicitonary into DynamoDB marshalled item
+
+    Walks the item with an explicit stack rather than recursing, so deeply
+    nested items don't pay a Python frame per nested dictionary or list.
+
+    Parameters
+    ----------
+    ddb_item: dict
+      The data to be converted to a DynamoDB marshalled item.
+    max_nesting_level: int
+      The maximum nested dictionaries allowed for any top-level item key.
+
+    Returns
+    -------
+    marshalled_item: dict
+      DynamoDB Marshalled Item.
+    attribute_levels: dict
+      The number of nested levels counted for each top-level item key.
+    """
+    attribute_levels = dict.fromkeys(ddb_item, 0)
+    marshalled_item = {}
+
+    # The container being filled is target, and children iterates over the
+    # (key, value) pairs left to marshal into it. A nested dict or list is walked as
+    # soon as it is found, with its parent saved on the stack until it is done, so
+    # the item is walked depth first in order. While a top-level key's value is
+    # walked, top_key holds that key and level its nesting level so far; top_key is
+    # None while filling the item itself, whose keys may be falsy.
+    target, children = marshalled_item, iter(ddb_item.items())
+    top_key = None
+    level = 0
+    stack = []
+
+    while True:
+        for key, value in children:
+            value_type = type(value)
+            tag = _LEAF_TAGS.get(value_type)
+
+            # Primitives are written inline, they are most of an item's values
+            if tag is not None:
+                if tag != 'N':
+                    target[key] = {tag: value}
+                    continue
+                # Must convert python numbers to strings for DDB consumption
+                if value_type is int:
+                    number = _INT_STR_CACHE.get(value)
+                    if number is None:
+                        number = str(value)
+                        if len(_INT_STR_CACHE) < _INT_STR_CACHE_SIZE:
+                            _INT_STR_CACHE[value] = number
+                else:
+                    number = str(value)
+                target[key] = {'N': number}
+                continue
+
+            # Exact types first; subclasses such as OrderedDict fall back to isinstance
+            if value_type is dict or isinstance(value, dict):
+                if top_key is None:
+                    top_key = key
+                nested = {}
+                if type(target) is list:
+                    # Dictionaries in lists are not counted as a nesting level
+                    target[key] = nested
+                else:
+                    level += 1
+                    if level > max_nesting_level:
+                        raise Exception(
+                            f'Item key, \'{top_key}\' exceeds maximum nesting levels of {max_nesting_level}'
+                        )
+                    target[key] = {'M': nested}
+                stack.append((target, children))
+                target, children = nested, iter(value.items())
+                break
+            elif value_type is list or isinstance(value, list):
+                if top_key is None:
+                    top_key = key
+                nested = [None] * len(value)
+                # List targets are pre-sized, so both containers are filled by key/index
+                target[key] = {'L': nested}
+                stack.append((target, children))
+                target, children = nested, enumerate(value)
+                break
+            else:
+                marshalled = _marshal_subclass(value)
+                if marshalled is not None:
+                    target[key] = marshalled
+                    continue
+
+                if type(target) is list:
+                    location = f'list index {key} of item key, \'{top_key}\''
+                elif stack:
+                    location = f'key \'{key}\' of item key, \'{top_key}\''
+                else:
+                    location = f'item key, \'{key}\''
+                raise ValueError(f'Unsupported type for {location}, received {value_type}')
+        else:
+            if not stack:
+                break
+            target, children = stack.pop()
+            if not stack:
+                # Back to filling the item itself, top_key's value is done
+                attribute_levels[top_key] = level
+                top_key = None
+                level = 0
+
+    return marshalled_item, attribute_levels
+
+
+def marshal(ddb_item: dict, max_nesting_level: int = 3) -> dict:
+    """Convert a python dictionary to a DynamoDB marshalled item
+
+    Use this instead of MarshalItem when only the marshalled item is needed,
+    e.g. when marshalling every item in a batch write.
+
+    >>> marshal({'pk': 'pk', 'obj': {'count': 2, 'tags': ['a']}})
+    {'pk': {'S': 'pk'}, 'obj': {'M': {'count': {'N': '2'}, 'tags': {'L': [{'S': 'a'}]}}}}
+
+    Parameters
+    ----------
+    ddb_item: dict
+      The data to be converted to a DynamoDB marshalled item.
+    max_nesting_level: int
+      The maximum nested dictionaries allowed for any top-level item key.
+
+    Returns
+    -------
+    marshalled_item: dict
+      DynamoDB Marshalled Item.
+    """
+    _validate(ddb_item, max_nesting_level)
+    return _marshal(ddb_item, max_nesting_level)[0]
 
 
 class MarshalItem:
@@ -6,18 +230,75 @@ class MarshalItem:
 
     A class to convert a dictionary to a DynamoDB marshalled Item.
     Since the attributes in my data object should never exceed 3 levels of nesting,
-    this class caps the item level nesting to 3 levels. This is done to prevent
-    memory issues from the recursive call.
+    this class caps the item level nesting to 3 levels by default.
 
     >>> sample = MarshalItem({'item': {'dict': {'str': 's', 'int': 1, 'float': 1.2, 'bool': True}}})
     >>> sample.marshalled_item
     {'item': {'M': {'dict': {'M': {'str': {'S': 's'}, 'int': {'N': '1'}, 'float': {'N': '1.2'}, 'bool': {'BOOL': True}}}}}}
 
+    >>> MarshalItem({'pk': 'pk'})
+    {
+      "pk": {
+        "S": "pk"
+      }
+    }
+
     >>> MarshalItem({'1': {'2': {'3': {'4': {'throw': 'ex'}}}}})
     Traceback (most recent call last):
     ...
     Exception: Item key, '1' exceeds maximum nesting levels of 3
 
+    Lists nested in lists are marshalled element by element
+    >>> MarshalItem({'grid': [[1, 2], ['a']]}).marshalled_item
+    {'grid': {'L': [{'L': [{'N': '1'}, {'N': '2'}]}, {'L': [{'S': 'a'}]}]}}
+
+    Dictionaries inside a list element count against the enclosing top-level key
+    >>> rows = MarshalItem({'rows': [{'cell': {'v': 1}}]})
+    >>> rows.marshalled_item
+    {'rows': {'L': [{'cell': {'M': {'v': {'N': '1'}}}}]}}
+    >>> rows.attribute_levels
+    {'rows': 1}
+
+    >>> MarshalItem({'rows': {'a': [{'x': {}}]}, 'x': 1}, 1)
+    Traceback (most recent call last):
+    ...
+    Exception: Item key, 'rows' exceeds maximum nesting levels of 1
+
+    >>> MarshalItem({'t0': {'a': {'b': {}}}, 't1': {'a': {}}}, 1)
+    Traceback (most recent call last):
+    ...
+    Exception: Item key, 't0' exceeds maximum nesting levels of 1
+
+    >>> MarshalItem({'': {'x': {'y': 1}}}).attribute_levels
+    {'': 2}
+
+    >>> from collections import OrderedDict
+    >>> MarshalItem(OrderedDict(a=OrderedDict(b=1))).marshalled_item
+    {'a': {'M': {'b': {'N': '1'}}}}
+
+    >>> from enum import Enum, IntEnum
+    >>> class Status(str, Enum):
+    ...     OK = 'ok'
+    >>> class Priority(IntEnum):
+    ...     HIGH = 1
+    >>> MarshalItem({'status': Status.OK, 'task': {'priority': Priority.HIGH}}).marshalled_item
+    {'status': {'S': 'ok'}, 'task': {'M': {'priority': {'N': '1'}}}}
+
+    >>> MarshalItem({'pk': None})
+    Traceback (most recent call last):
+    ...
+    ValueError: Unsupported type for item key, 'pk', received <class 'NoneType'>
+
+    >>> MarshalItem({'a': {'b': None}})
+    Traceback (most recent call last):
+    ...
+    ValueError: Unsupported type for key 'b' of item key, 'a', received <class 'NoneType'>
+
+    >>> MarshalItem({'tags': ['a', None]})
+    Traceback (most recent call last):
+    ...
+    ValueError: Unsupported type for list index 1 of item key, 'tags', received <class 'NoneType'>
+
     >>> MarshalItem(1)
     Traceback (most recent call last):
     ...
@@ -36,6 +317,8 @@ class MarshalItem:
       The number of nested levels for each attribute in the item.
       0 if the item is not a dictionary.
     """
+    __slots__ = ('max_nesting_level', '__attribute_levels', '__marshalled_item')
+
     DDB_PRIMITIVES_MAP = {
         str: 'S',  # DynamoDB String Attribute Type
         int: 'N',  # DynamoDB Number Attribute Type
@@ -55,20 +338,21 @@ class MarshalItem:
         max_nesting_levels: int
           The maximum nested dictionaries allowed for any top-level item key.
         """
-        if type(ddb_item) != dict:
-            raise ValueError(f'Expected `class <dict>`, received {type(ddb_item)}')
-        if (
-            type(max_nesting_level) != int
-            or max_nesting_level > 10
-            or max_nesting_level < 1
-        ):
-            raise ValueError(
-                f'Expected an integer between 1 and 10 inclusive for max_nesting_level, received {max_nesting_level}'
-            )
+        _validate(ddb_item, max_nesting_level)
 
         self.max_nesting_level = max_nesting_level
-        self.__attribute_levels = {key: 0 for key in ddb_item.keys()}
-        self.__marshalled_item = self.__marshal_object(ddb_item)
+        self.__marshalled_item, self.__attribute_levels = _marshal(
+            ddb_item, max_nesting_level
+        )
+
+    def __repr__(self) -> str:
+        """Returns the marshalled item as indented JSON, using orjson when installed"""
+        if orjson is not None:
+            return orjson.dumps(
+                self.__marshalled_item,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+            ).decode()
+        return json.dumps(self.__marshalled_item, indent=2, ensure_ascii=False)
 
     @property
     def marshalled_item(self) -> dict:
@@ -80,63 +364,9 @@ class MarshalItem:
 
         Reverse sorts based on an attributes number of levels
         """
-        sorted_count = {
-            k: v
-            for k, v in sorted(
-                self.__attribute_levels.items(), key=lambda item: -item[1]
-            )
-        }
-        return sorted_count
-
-    def __marshal_object(self, ddb_item: dict, top_key: Optional[str] = None):
-        """Convert dicitonary into DynamoDB marshalled item
-
-        Parameters
-        ----------
-        ddb_item: any
-          The data to be converted to a DynamoDB marshalled item.
-        top_key: str | None
-          Top Level item key provided when we need to increment the nesting level
+        return dict(
+            sorted(self.__attribute_levels.items(), key=itemgetter(1), reverse=True)
+        )
 
-        Returns
-        -------
-        marshalled_item: dict
-          DynamoDB Marshalled Item.
-        """
 
-        if top_key:
-            if self.__attribute_levels[top_key] < self.max_nesting_level:
-                self.__attribute_levels[top_key] += 1
-            else:
-                raise Exception(
-                    f'Item key, \'{top_key}\' exceeds maximum nesting levels of {self.max_nesting_level}'
-                )
-
-        marshalled_item = {}
-
-        try:
-            for key, value in ddb_item.items():
-                marshalled_type = self.DDB_PRIMITIVES_MAP[type(value)]
-
-                if marshalled_type == 'L':
-                    marshalled_item[key] = {marshalled_type: []}
-                    for list_item in value:
-                        marshalled_item[key][marshalled_type].append(self.__marshal_object(list_item))
-                elif marshalled_type == 'M':
-                    # recursively marshal dicionary
-                    marshalled_item[key] = {marshalled_type: self.__marshal_object(value, top_key or key)}
-                else:
-                    # Primitive number, bool, or str
-                    # Must convert python numbers to strings for DDB consumption
-                    item_value = value if marshalled_type != 'N' else str(value)
-                    marshalled_item[key] = {marshalled_type: item_value}
-        except AttributeError:
-            # Base Case, item is a primitive.
-            marshalled_type = self.DDB_PRIMITIVES_MAP[type(ddb_item)]
-
-            # Must convert python numbers to strings for DDB consumption
-            marshalled_item[marshalled_type] = (
-                ddb_item if marshalled_type != 'N' else str(ddb_item)
-            )
-
-        return marshalled_item
+_build_leaf_tags()